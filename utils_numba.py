@@ -0,0 +1,54 @@
+"""Numba-accelerated geometry helpers for the Gerber viewer.
+
+Numba is optional: when it is missing the module exports NumPy
+implementations with the same signatures, so callers never need to
+check which path is active. With Numba present, cache=True persists the
+compiled code on disk and amortizes the first-call compile cost.
+"""
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+def _arc_angles_py(sx, sy, ex, ey, cx, cy, clockwise):
+    """Start angle, sweep and radius of a circular arc, in degrees."""
+    dx1 = sx - cx; dy1 = sy - cy
+    dx2 = ex - cx; dy2 = ey - cy
+    radius = math.sqrt(dx1 * dx1 + dy1 * dy1)
+    angle1 = math.degrees(math.atan2(dy1, dx1)) % 360.0
+    angle2 = math.degrees(math.atan2(dy2, dx2)) % 360.0
+    if clockwise:
+        sweep = (angle2 - angle1 - 360.0) if angle2 > angle1 else (angle2 - angle1)
+    else:
+        sweep = (angle2 - angle1 + 360.0) if angle1 > angle2 else (angle2 - angle1)
+    return angle1, sweep, radius
+
+
+def _signed_ring_area_np(pts):
+    """Signed shoelace area of a closed (N, 2) coordinate ring."""
+    return 0.5 * (np.dot(pts[:-1, 0], pts[1:, 1])
+                  - np.dot(pts[1:, 0], pts[:-1, 1]))
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def signed_ring_area(pts):
+        """Signed shoelace area of a closed (N, 2) coordinate ring."""
+        area = 0.0
+        for i in range(len(pts) - 1):
+            area += pts[i, 0] * pts[i + 1, 1] - pts[i + 1, 0] * pts[i, 1]
+        return 0.5 * area
+else:
+    signed_ring_area = _signed_ring_area_np
+
+
+if HAVE_NUMBA:
+    arc_angles = njit(cache=True, fastmath=True)(_arc_angles_py)
+else:
+    arc_angles = _arc_angles_py